@@ -1,24 +1,23 @@
-import sqlite3
 from pathlib import Path
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]
-SQLITE_PATH = ROOT / "data" / "mexico" / "processed" / "mexico_devices.sqlite"
+PARQUET_PATH = ROOT / "data" / "mexico" / "processed" / "mexico_devices.parquet"
 
-conn = sqlite3.connect(SQLITE_PATH)
-df = pd.read_sql_query("SELECT * FROM mexico_devices", conn)
-conn.close()
+# Only the two columns we need; Parquet is columnar, so the rest is never read
+df = pd.read_parquet(PARQUET_PATH, columns=["year", "consecutivo"])
 
-df_2017 = df[df["year"] == 2017].copy()
+# Just the 2017 consecutivo column; no copy of the rest of the frame
+df_2017 = df.loc[df["year"].to_numpy() == 2017, ["consecutivo"]].reset_index(drop=True)
 df_2017 = df_2017[df_2017["consecutivo"].notna()]
 df_2017["consecutivo_int"] = df_2017["consecutivo"].astype(int)
 
+counts = df_2017["consecutivo_int"].value_counts()
 dup = (
-    df_2017.groupby("consecutivo_int")
-    .size()
+    counts[counts > 1]
+    .sort_index()
+    .rename_axis("consecutivo_int")
     .reset_index(name="count")
-    .query("count > 1")
-    .sort_values("consecutivo_int")
 )
 
 print(dup.head(20))
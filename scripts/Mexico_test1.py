@@ -1,15 +1,15 @@
-import sqlite3
 from pathlib import Path
+import numpy as np
 import pandas as pd
 
 ROOT = Path(__file__).resolve().parents[1]   # same as in build_mexico_db.py
-SQLITE_PATH = ROOT / "data" / "mexico" / "processed" / "mexico_devices.sqlite"
+PARQUET_PATH = ROOT / "data" / "mexico" / "processed" / "mexico_devices.parquet"
 
-conn = sqlite3.connect(SQLITE_PATH)
-df = pd.read_sql_query("SELECT * FROM mexico_devices", conn)
-conn.close()
+# Only the two columns we need; Parquet is columnar, so the rest is never read
+df = pd.read_parquet(PARQUET_PATH, columns=["year", "consecutivo"])
 
-df_2017 = df[df["year"] == 2017].copy()
+# Just the 2017 consecutivo column; no copy of the rest of the frame
+df_2017 = df.loc[df["year"].to_numpy() == 2017, ["consecutivo"]].reset_index(drop=True)
 
 # Convert consecutivo to int, dropping weird/missing values
 df_2017 = df_2017[df_2017["consecutivo"].notna()]
@@ -21,9 +21,9 @@ max_consec = df_2017["consecutivo_int"].max()
 min_consec = df_2017["consecutivo_int"].min()
 print("Consecutivo range:", min_consec, "→", max_consec)
 
-expected = set(range(1, max_consec + 1))  # 1..1592 (if that’s the max)
-seen = set(df_2017["consecutivo_int"].tolist())
-missing = sorted(expected - seen)
+# 1..1592 (if that’s the max) minus what we saw; setdiff1d returns it sorted
+seen = df_2017["consecutivo_int"].to_numpy()
+missing = np.setdiff1d(np.arange(1, max_consec + 1), seen)
 
-print("Missing consecutivo values:", missing[:50])
+print("Missing consecutivo values:", missing[:50].tolist())
 print("Number of missing:", len(missing))
@@ -2,7 +2,7 @@
 Build a normalized Mexico device table from COFEPRIS PDFs.
 
 - Reads PDFs from data/mexico/raw
-- Parses them with pdfplumber and some regex
+- Parses them with PyMuPDF and some regex
 - Writes:
     - data/mexico/processed/mexico_devices.parquet
     - data/mexico/processed/mexico_devices.sqlite (table: mexico_devices)
@@ -17,14 +17,26 @@ Design notes:
   description/date pages. So we don't lose devices, only some extra text/date.
 """
 
+import bisect
+import contextlib
+import hashlib
+import itertools
+import multiprocessing
+import os
 import re
-import io
 import sqlite3
 from pathlib import Path
 
-import pdfplumber
+import numpy as np
+import pymupdf
 import pandas as pd
 
+try:  # Parquet output is optional; the SQLite file is always written
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pq = None
+
 
 # ---------------------------------------------------------------------
 # Paths – adjust if your layout is different
@@ -37,21 +49,256 @@ PROCESSED_DIR.mkdir(parents=True, exist_ok=True)
 
 SQLITE_PATH = PROCESSED_DIR / "mexico_devices.sqlite"
 PARQUET_PATH = PROCESSED_DIR / "mexico_devices.parquet"
+CACHE_DIR = PROCESSED_DIR / "cache"   # parsed rows per PDF, see _cache_path()
+
+
+# ---------------------------------------------------------------------
+# Regexes used in the per-row loops (compiled once)
+# ---------------------------------------------------------------------
+
+# dd/mm/yyyy
+_RE_DATE = re.compile(r"\d{2}/\d{2}/\d{4}")
+# consecutivo at the start of a line, e.g. '\n0241 '
+_RE_CONSEC = re.compile(r"\n(\d{3,4})\s")
+# registration number like '0241R2021 SSA', '0241E2021 SSA', etc.
+_RE_REG = re.compile(r"\b(\d{3,4}[A-Z]\d{4}\s+SSA)\b")
+
+
+# ---------------------------------------------------------------------
+# Output columns – parsers emit row tuples with values in this order
+# ---------------------------------------------------------------------
+
+COLS = (
+    "country",
+    "year",
+    "source_file",
+    "consecutivo",
+    "registro_sanitario",
+    "denominacion_distintiva",
+    "holder",
+    "denominacion_generica",
+    "categoria",
+    "clase",
+    "fecha_emision",
+    "details",
+    "raw_line",
+)
+
+
+def _to_columns(rows):
+    """
+    Transpose a parser's row tuples (values in COLS order) into
+    {column: values}, the shape the rest of the pipeline works with.
+    """
+    columns = list(zip(*rows)) or [()] * len(COLS)
+    return dict(zip(COLS, columns))
 
 
 # ---------------------------------------------------------------------
-# Helper: load PDF bytes
+# Helpers: page selection, table / text access on a PyMuPDF page
 # ---------------------------------------------------------------------
 
-def _load_pdf_bytes(path: Path) -> bytes:
-    return path.read_bytes()
+def _select_pages(doc, pages=None):
+    """Iterate the given page indices of doc (all pages if pages is None)."""
+    if pages is None:
+        return iter(doc)
+    return (doc[i] for i in pages)
+
+
+def _largest_table(page):
+    """
+    Rows of the largest table on the page (list of lists of cell text),
+    or None if the page has no table.
+
+    PyMuPDF's find_tables() returns every table it detects; we keep the one
+    with the most cells, which is what pdfplumber's extract_table() did.
+    Only the cell grid comes from PyMuPDF, the text is read by _cell_texts.
+    """
+    tables = page.find_tables().tables
+    if not tables:
+        return None
+    largest = min(tables, key=lambda t: (-len(t.cells), t.bbox[1], t.bbox[0]))
+    return _cell_texts(page, largest.rows)
+
+
+# Character flags for _cell_texts and _band_texts. Unlike Table.extract() and
+# the default word flags we keep glyphs that MuPDF considers clipped (it drops
+# periods and commas, e.g. in "S.A. DE C.V.", in these PDFs) and split
+# ligatures ("ﬁ" -> "fi") the way pdfplumber does.
+_TEXT_FLAGS = (
+    pymupdf.TEXTFLAGS_WORDS & ~pymupdf.TEXT_CLIP & ~pymupdf.TEXT_PRESERVE_LIGATURES
+)
+
+
+def _cell_texts(page, rows, x_tolerance: float = 3, y_tolerance: float = 3):
+    """
+    Text of every cell of a find_tables() table, given its rows: a list of
+    lists like Table.extract(), None for cells merged into a neighbour.
+
+    Follows pdfplumber's extract_table() so cell text matches what the
+    pdfplumber-based parser produced: a character belongs to the cell holding
+    its centre, with the box pdfminer gives it (one font size tall, resting on
+    the font's descent), and each cell's characters are grouped into lines by
+    top edge, sorted left to right and split into words at spaces, gaps wider
+    than x_tolerance and jumps in height (sub-/superscripts).
+    """
+    tops = [row.bbox[1] for row in rows]
+    chars = {}
+    raw = page.get_text("rawdict", flags=_TEXT_FLAGS)
+    for block in raw["blocks"]:
+        for line in block.get("lines", ()):
+            for span in line["spans"]:
+                size, descender = span["size"], span["descender"]
+                for ch in span["chars"]:
+                    x0, _, x1, _ = ch["bbox"]
+                    bottom = ch["origin"][1] - descender * size
+                    top = bottom - size
+                    cx, cy = (x0 + x1) / 2, (top + bottom) / 2
+                    i = bisect.bisect_right(tops, cy) - 1
+                    if i < 0 or cy >= rows[i].bbox[3]:
+                        continue
+                    for j, cell in enumerate(rows[i].cells):
+                        if cell is not None and cell[0] <= cx < cell[2] and cell[1] <= cy < cell[3]:
+                            chars.setdefault((i, j), []).append((x0, top, x1, bottom, ch["c"]))
+                            break
+
+    texts = []
+    for i, row in enumerate(rows):
+        texts.append([])
+        for j, cell in enumerate(row.cells):
+            if cell is None:
+                texts[-1].append(None)
+                continue
+            words = []
+            for line in _cluster_tops(chars.get((i, j), ()), y_tolerance):
+                word = prev = None
+                for x0, top, x1, bottom, c in sorted(line, key=lambda ch: ch[0]):
+                    if c.isspace():
+                        word = None
+                        continue
+                    if word is not None and (
+                        x0 < prev[0] or x0 > prev[2] + x_tolerance
+                        or abs(top - prev[1]) > y_tolerance
+                    ):
+                        word = None
+                    if word is None:
+                        word = [x0, top, x1, bottom, c]
+                        words.append(word)
+                    else:
+                        word[0], word[1] = min(word[0], x0), min(word[1], top)
+                        word[2], word[3] = max(word[2], x1), max(word[3], bottom)
+                        word[4] += c
+                    prev = (x0, top, x1)
+            texts[-1].append(_join_lines(words, y_tolerance))
+    return texts
+
+
+def _cluster_tops(items, tolerance: float):
+    """Group (x0, top, ...) items into lines by top edge, like pdfplumber's cluster_objects()."""
+    lines = []
+    last = None
+    for item in sorted(items, key=lambda it: it[1]):
+        if last is None or item[1] > last + tolerance:
+            lines.append([])
+        lines[-1].append(item)
+        last = item[1]
+    return lines
+
+
+def _row_bands(page):
+    """
+    Rectangles of the rows of a single-column ruled table.
+
+    The 2020–2023 tables are drawn as a stack of full-width horizontal rules;
+    each pair of neighbouring rules bounds one printed row.
+    """
+    ys = set()
+    x0, x1 = page.rect.x1, page.rect.x0
+    for drawing in page.get_drawings():
+        r = drawing["rect"]
+        if r.height < 2 and r.width > page.rect.width / 2:
+            ys.add(round((r.y0 + r.y1) / 2, 1))
+            x0, x1 = min(x0, r.x0), max(x1, r.x1)
+
+    ys = sorted(ys)
+    return [pymupdf.Rect(x0, top, x1, bottom) for top, bottom in zip(ys, ys[1:])]
+
+
+def _band_texts(page, bands, y_tolerance: float = 3):
+    """
+    Text of each band (see _row_bands), one line per visual line, words left to right.
+
+    The page's characters are extracted once and each one is assigned to the
+    band containing its centre, instead of re-running text extraction clipped
+    to every band: that was most of the parse time, and glyphs straddling a
+    rule ended up in both neighbouring rows.
+    Lines are clustered like pdfplumber's extract_text(), so the regexes below
+    (e.g. consecutivo after a line break) see the layout they were written for.
+    """
+    tops = [band.y0 for band in bands]
+    words = [[] for _ in bands]
+    raw = page.get_text("rawdict", flags=_TEXT_FLAGS)
+    for block in raw["blocks"]:
+        for line in block.get("lines", ()):
+            # current word per band: [x0, y0, x1, y1, text]
+            current = {}
+            for span in line["spans"]:
+                for ch in span["chars"]:
+                    x0, y0, x1, y1 = ch["bbox"]
+                    cx, cy = (x0 + x1) / 2, (y0 + y1) / 2
+                    i = bisect.bisect_right(tops, cy) - 1
+                    if i < 0 or cy >= bands[i].y1 or not bands[i].x0 <= cx < bands[i].x1:
+                        continue
+                    if ch["c"].isspace():
+                        if i in current:
+                            words[i].append(current.pop(i))
+                        continue
+                    w = current.get(i)
+                    if w is None:
+                        current[i] = [x0, y0, x1, y1, ch["c"]]
+                    else:
+                        w[0], w[1] = min(w[0], x0), min(w[1], y0)
+                        w[2], w[3] = max(w[2], x1), max(w[3], y1)
+                        w[4] += ch["c"]
+            for i, w in current.items():
+                words[i].append(w)
+
+    return [_join_lines(ws, y_tolerance) for ws in words]
+
+
+def _extract(s, pattern):
+    """First capture group of pattern in each string of s, None where it doesn't match."""
+    matches = s.str.extract(pattern, expand=False)
+    return matches.astype(object).where(matches.notna(), None).tolist()
+
+
+def _join_lines(words, y_tolerance: float):
+    """Cluster (x0, y0, x1, y1, text) words into lines by top edge and join them."""
+    words = sorted(words, key=lambda w: w[1])
+
+    lines = []
+    line = []
+    top = None
+    for w in words:
+        if top is None or w[1] - top > y_tolerance:
+            if line:
+                lines.append(line)
+            line = []
+            top = w[1]
+        line.append(w)
+    if line:
+        lines.append(line)
+
+    return "\n".join(
+        " ".join(w[4] for w in sorted(ln, key=lambda w: w[0])) for ln in lines
+    )
 
 
 # ---------------------------------------------------------------------
 # 2017 parser – special-but-simple
 # ---------------------------------------------------------------------
 
-def parse_2017(pdf_bytes: bytes, source_name: str):
+def parse_2017(path: Path, source_name: str, pages=None):
     """
     reg_dm_2017.pdf
 
@@ -67,14 +314,24 @@ def parse_2017(pdf_bytes: bytes, source_name: str):
     - Decide a device row by: first column is a number (consecutivo).
     - We do NOT deduplicate by consecutivo or registro_sanitario:
       if the PDF prints two rows, we keep two rows.
-    - Description/date pages (2-column) are ignored for now.
+    - Description/date pages (2-column) are ignored for now, and skipped
+      before table detection.
+
+    Like the other parsers, `pages` restricts parsing to those page indices
+    so one PDF can be split across worker processes.
     """
 
     rows = []
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page_index, page in enumerate(pdf.pages):
-            table = page.extract_table()
+    with pymupdf.open(path) as doc:
+        for page in _select_pages(doc, pages):
+            # Description/date pages (the second half of the file) have no
+            # registration numbers; a plain text scan finds that far more
+            # cheaply than running table detection just to discard the table.
+            if not _RE_REG.search(page.get_text()):
+                continue
+
+            table = _largest_table(page)
             if not table:
                 continue
 
@@ -103,34 +360,34 @@ def parse_2017(pdf_bytes: bytes, source_name: str):
                     cells.append("")
 
                 rows.append(
-                    dict(
-                        country="MX",
-                        year=2017,
-                        source_file=source_name,
-                        consecutivo=cells[0] or None,
-                        registro_sanitario=cells[1] or None,
-                        denominacion_distintiva=cells[2] or None,
-                        holder=cells[3] or None,
-                        denominacion_generica=None,
-                        categoria=None,
-                        clase=cells[4] or None,
-                        fecha_emision=None,  # could be enriched later from 2-col table
-                        details=None,        # could also be enriched later
-                        raw_line=None,
+                    (
+                        "MX",              # country
+                        2017,              # year
+                        source_name,       # source_file
+                        cells[0] or None,  # consecutivo
+                        cells[1] or None,  # registro_sanitario
+                        cells[2] or None,  # denominacion_distintiva
+                        cells[3] or None,  # holder
+                        None,              # denominacion_generica
+                        None,              # categoria
+                        cells[4] or None,  # clase
+                        None,              # fecha_emision – could be enriched later from 2-col table
+                        None,              # details – could also be enriched later
+                        None,              # raw_line
                     )
                 )
 
-    return rows
+    return _to_columns(rows)
 
 
 # ---------------------------------------------------------------------
 # 2018–2019 parser
 # ---------------------------------------------------------------------
 
-def parse_2018_2019(pdf_bytes: bytes, year: int, source_name: str):
+def parse_2018_2019(path: Path, year: int, source_name: str, pages=None):
     """
     2018 & 2019 PDFs:
-    pdfplumber gives a 5-column table like:
+    find_tables() gives a 5-column table like:
     [Consecutivo, Registro, (big composite cell), Fecha, Denom. genérica]
 
     We extract:
@@ -142,25 +399,33 @@ def parse_2018_2019(pdf_bytes: bytes, year: int, source_name: str):
     """
     rows = []
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table()
+    with pymupdf.open(path) as doc:
+        for page in _select_pages(doc, pages):
+            table = _largest_table(page)
             if not table:
                 continue
 
+            # Headers only appear at the top of a page: once a data row has
+            # been seen, a numeric consecutivo is all we need to check.
+            saw_data = False
+
             for raw_row in table:
                 if not raw_row or not any(raw_row):
                     continue
 
                 cells = [(c or "") for c in raw_row]
 
-                # skip obvious header rows
-                first = cells[0].lower()
-                if (
-                    "conse" in first
-                    or "consecutivo" in first
-                    or ("registro" in " ".join(cells).lower() and not cells[0].strip().isdigit())
-                ):
+                if not saw_data:
+                    # skip obvious header rows
+                    first = cells[0].lower()
+                    if (
+                        "conse" in first
+                        or "consecutivo" in first
+                        or ("registro" in " ".join(cells).lower() and not cells[0].strip().isdigit())
+                    ):
+                        continue
+                    saw_data = True
+                elif not cells[0].strip().isdigit():
                     continue
 
                 while len(cells) < 3:
@@ -171,38 +436,39 @@ def parse_2018_2019(pdf_bytes: bytes, year: int, source_name: str):
                 generic = (cells[-1].strip() or None) if len(cells) >= 3 else None
 
                 all_text = " ".join(c.strip() for c in cells[2:])
-                m_date = re.search(r"\d{2}/\d{2}/\d{4}", all_text)
+                m_date = _RE_DATE.search(all_text)
                 fecha = m_date.group(0) if m_date else None
 
                 rows.append(
-                    dict(
-                        country="MX",
-                        year=year,
-                        source_file=source_name,
-                        consecutivo=consecutivo,
-                        registro_sanitario=registro,
-                        denominacion_distintiva=None,
-                        holder=None,  # usually buried in the composite cell
-                        denominacion_generica=generic,
-                        categoria=None,
-                        clase=None,
-                        fecha_emision=fecha,
-                        details=all_text or None,
-                        raw_line=None,
+                    (
+                        "MX",              # country
+                        year,              # year
+                        source_name,       # source_file
+                        consecutivo,       # consecutivo
+                        registro,          # registro_sanitario
+                        None,              # denominacion_distintiva
+                        None,              # holder – usually buried in the composite cell
+                        generic,           # denominacion_generica
+                        None,              # categoria
+                        None,              # clase
+                        fecha,             # fecha_emision
+                        all_text or None,  # details
+                        None,              # raw_line
                     )
                 )
 
-    return rows
+    return _to_columns(rows)
 
 
 # ---------------------------------------------------------------------
 # 2020–2023 parser – messy single-column text tables
 # ---------------------------------------------------------------------
 
-def parse_singlecol_weird(pdf_bytes: bytes, year: int, source_name: str):
+def parse_singlecol_weird(path: Path, year: int, source_name: str, pages=None):
     """
-    2020–2023 PDFs: pdfplumber usually gives a 1-column "table"
-    where each row is long concatenated text.
+    2020–2023 PDFs: the table is a single ruled column where each row is
+    long concatenated text (table detection finds no usable columns).
+    Rows are cut between the horizontal rules and read as plain text.
 
     We keep it simple:
     - raw_line: entire row text
@@ -211,65 +477,92 @@ def parse_singlecol_weird(pdf_bytes: bytes, year: int, source_name: str):
     - fecha_emision: first dd/mm/yyyy
     Everything else stays in raw_line/details for later manual/advanced parsing.
     """
-    rows = []
+    texts = []
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table()
-            if not table:
-                continue
-
-            for i, raw_row in enumerate(table):
-                if not raw_row or not any(raw_row):
-                    continue
-
-                text = (raw_row[0] or "").strip()
+    with pymupdf.open(path) as doc:
+        for page in _select_pages(doc, pages):
+            for i, text in enumerate(_band_texts(page, _row_bands(page))):
+                text = text.strip()
                 if not text:
                     continue
 
                 # skip header row if present
-                if i == 0 and "razón social" in text.lower():
-                    continue
-                if i == 0 and "consecutivo" in text.lower():
-                    continue
-
-                # consecutivo pattern (often after a newline)
-                m_consec = re.search(r"\n(\d{3,4})\s", text)
-                consecutivo = m_consec.group(1) if m_consec else None
-
-                # registration pattern like '0241R2021 SSA', '0241E2021 SSA', etc.
-                m_reg = re.search(r"\b(\d{3,4}[A-Z]\d{4}\s+SSA)\b", text)
-                registro = m_reg.group(1) if m_reg else None
-
-                m_date = re.search(r"\d{2}/\d{2}/\d{4}", text)
-                fecha = m_date.group(0) if m_date else None
-
-                rows.append(
-                    dict(
-                        country="MX",
-                        year=year,
-                        source_file=source_name,
-                        consecutivo=consecutivo,
-                        registro_sanitario=registro,
-                        denominacion_distintiva=None,
-                        holder=None,
-                        denominacion_generica=None,
-                        categoria=None,
-                        clase=None,
-                        fecha_emision=fecha,
-                        details=None,
-                        raw_line=text,
-                    )
-                )
+                if i == 0:
+                    low = text.lower()
+                    if "razón social" in low or "consecutivo" in low:
+                        continue
+
+                texts.append(text)
+
+    # One vectorized pass per pattern over all row texts instead of
+    # three re.search calls per row.
+    s = pd.Series(texts, dtype=object)
+    # consecutivo pattern (often after a newline)
+    consecutivos = _extract(s, _RE_CONSEC)
+    # registration pattern like '0241R2021 SSA', '0241E2021 SSA', etc.
+    registros = _extract(s, _RE_REG)
+    fechas = _extract(s, f"({_RE_DATE.pattern})")
+
+    rows = [
+        (
+            "MX",         # country
+            year,         # year
+            source_name,  # source_file
+            consecutivo,  # consecutivo
+            registro,     # registro_sanitario
+            None,         # denominacion_distintiva
+            None,         # holder
+            None,         # denominacion_generica
+            None,         # categoria
+            None,         # clase
+            fecha,        # fecha_emision
+            None,         # details
+            text,         # raw_line
+        )
+        for consecutivo, registro, fecha, text in zip(consecutivos, registros, fechas, texts)
+    ]
 
-    return rows
+    return _to_columns(rows)
 
 
 # ---------------------------------------------------------------------
 # 2024+ parser – nice wide tables
 # ---------------------------------------------------------------------
 
-def parse_2024plus(pdf_bytes: bytes, year: int, source_name: str):
+def _header_index(header):
+    """
+    Column position of each field in a 2024+ table header (None if missing), as
+    (consecutivo, registro, denom. distintiva, holder, denom. genérica,
+    categoria, clase, fecha).
+    """
+    idx = {}
+    for i, h in enumerate(header):
+        h = h.lower().replace("\n", " ")
+        if "consecutivo" in h:
+            idx["consecutivo"] = i
+        if "razón social" in h or "razon social" in h:
+            idx["holder"] = i
+        if "registro" in h and "sanitario" in h:
+            idx["registro"] = i
+        if "denominación" in h and "genérica" in h:
+            idx["denom_generica"] = i
+        if "denominación" in h and "distintiva" in h:
+            idx["denom_dist"] = i
+        if "categoria" in h or "categoría" in h:
+            idx["categoria"] = i
+        if "clase" in h:
+            idx["clase"] = i
+        if "fecha" in h:
+            idx["fecha"] = i
+
+    keys = (
+        "consecutivo", "registro", "denom_dist", "holder",
+        "denom_generica", "categoria", "clase", "fecha",
+    )
+    return tuple(idx.get(k) for k in keys)
+
+
+def parse_2024plus(path: Path, year: int, source_name: str, pages=None):
     """
     2024 & 2025 PDFs are nicer: wide tables with real columns.
 
@@ -279,163 +572,344 @@ def parse_2024plus(pdf_bytes: bytes, year: int, source_name: str):
      Categoria, Clase, Fecha de emisión]
     """
     rows = []
+    last_header = None
 
-    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
-        for page in pdf.pages:
-            table = page.extract_table()
+    with pymupdf.open(path) as doc:
+        for page in _select_pages(doc, pages):
+            table = _largest_table(page)
             if not table:
                 continue
 
-            header = [c or "" for c in table[0]]
-            norm = [h.lower().replace("\n", " ") for h in header]
-
-            idx = {}
-            for i, h in enumerate(norm):
-                if "consecutivo" in h:
-                    idx["consecutivo"] = i
-                if "razón social" in h or "razon social" in h:
-                    idx["holder"] = i
-                if "registro" in h and "sanitario" in h:
-                    idx["registro"] = i
-                if "denominación" in h and "genérica" in h:
-                    idx["denom_generica"] = i
-                if "denominación" in h and "distintiva" in h:
-                    idx["denom_dist"] = i
-                if "categoria" in h or "categoría" in h:
-                    idx["categoria"] = i
-                if "clase" in h:
-                    idx["clase"] = i
-                if "fecha" in h:
-                    idx["fecha"] = i
-
-            def get(cells, key):
-                j = idx.get(key)
-                if j is None or j >= len(cells):
-                    return None
-                return (cells[j] or "").strip() or None
+            # Every page repeats the header; map it to column positions once
+            # and only redo that if a page's header differs.
+            header = tuple(c or "" for c in table[0])
+            if header != last_header:
+                idx = _header_index(header)
+                last_header = header
 
             # data rows
             for raw_row in table[1:]:
                 if not raw_row or not any(raw_row):
                     continue
                 cells = [c or "" for c in raw_row]
+                n = len(cells)
+
+                consecutivo, registro, dist, holder, generica, categoria, clase, fecha = (
+                    (cells[j].strip() or None) if j is not None and j < n else None
+                    for j in idx
+                )
 
                 rows.append(
-                    dict(
-                        country="MX",
-                        year=year,
-                        source_file=source_name,
-                        consecutivo=get(cells, "consecutivo"),
-                        registro_sanitario=get(cells, "registro"),
-                        denominacion_distintiva=get(cells, "denom_dist"),
-                        holder=get(cells, "holder"),
-                        denominacion_generica=get(cells, "denom_generica"),
-                        categoria=get(cells, "categoria"),
-                        clase=get(cells, "clase"),
-                        fecha_emision=get(cells, "fecha"),
-                        details=None,
-                        raw_line=None,
+                    (
+                        "MX",         # country
+                        year,         # year
+                        source_name,  # source_file
+                        consecutivo,  # consecutivo
+                        registro,     # registro_sanitario
+                        dist,         # denominacion_distintiva
+                        holder,       # holder
+                        generica,     # denominacion_generica
+                        categoria,    # categoria
+                        clase,        # clase
+                        fecha,        # fecha_emision
+                        None,         # details
+                        None,         # raw_line
                     )
                 )
 
-    return rows
+    return _to_columns(rows)
 
 
 # ---------------------------------------------------------------------
-# Main: iterate through all PDFs and build a single DataFrame
+# Main: parse all PDFs (in page chunks, across processes) and write them out file by file
 # ---------------------------------------------------------------------
 
-def build_mexico_devices():
-    all_rows = []
-
-    files_and_years = {
-        "reg_dm_2017.pdf": 2017,
-        "Registros_Sanitarios_DM2018.pdf": 2018,
-        "Registros_Sanitarios_DM2019.pdf": 2019,
-        "Registros_Sanitarios_DM2020.pdf": 2020,
-        "Registros_Sanitarios_DM2021-1.pdf": 2021,
-        "Registros_Sanitarios_DM2022-1.pdf": 2022,
-        "Registros_Sanitarios_DM2023.pdf": 2023,
-        "Registros_Sanitarios_DM_2024.pdf": 2024,
-        "Registros_Sanitarios_DM_abr_2025.pdf": 2025,
+FILES_AND_YEARS = {
+    "reg_dm_2017.pdf": 2017,
+    "Registros_Sanitarios_DM2018.pdf": 2018,
+    "Registros_Sanitarios_DM2019.pdf": 2019,
+    "Registros_Sanitarios_DM2020.pdf": 2020,
+    "Registros_Sanitarios_DM2021-1.pdf": 2021,
+    "Registros_Sanitarios_DM2022-1.pdf": 2022,
+    "Registros_Sanitarios_DM2023.pdf": 2023,
+    "Registros_Sanitarios_DM_2024.pdf": 2024,
+    "Registros_Sanitarios_DM_abr_2025.pdf": 2025,
+}
+
+# Pages handed to one worker at a time. Every parser works page by page,
+# so chunks are independent; small enough that the big PDFs (2018, 2024)
+# spread over all cores instead of pinning one.
+PAGES_PER_TASK = 20
+
+
+def _parse_pages(task):
+    """
+    Parse a chunk of pages of one PDF with its year-specific parser.
+    task is (fname, year, page indices). Runs in a worker process, which
+    opens the PDF itself by path.
+    """
+    fname, year, pages = task
+    path = RAW_DIR / fname
+
+    if year == 2017:
+        return parse_2017(path, fname, pages)
+    elif year in (2018, 2019):
+        return parse_2018_2019(path, year, fname, pages)
+    elif year in (2020, 2021, 2022, 2023):
+        return parse_singlecol_weird(path, year, fname, pages)
+    else:  # 2024, 2025+
+        return parse_2024plus(path, year, fname, pages)
+
+
+def _cumcount(*keys):
+    """
+    Position of each row within its group of equal keys, in row order –
+    the same as df.groupby(keys).cumcount(), but on plain numpy arrays.
+    """
+    # One int64 group code per row. factorize hashes the keys; np.unique would
+    # sort the object (string) arrays, which is slower than the groupby itself.
+    group = np.zeros(len(keys[0]), dtype=np.int64)
+    for key in keys:
+        codes, uniq = pd.factorize(key)
+        group = group * len(uniq) + codes
+
+    # Stable sort keeps row order inside each group; a row's count is its
+    # distance from the first row of its run in the sorted order.
+    order = np.argsort(group, kind="stable")
+    sorted_group = group[order]
+    run_start = np.ones(len(group), dtype=bool)
+    run_start[1:] = sorted_group[1:] != sorted_group[:-1]
+    pos = np.arange(len(group))
+    first = np.maximum.accumulate(np.where(run_start, pos, 0))
+
+    counts = np.empty_like(group)
+    counts[order] = pos - first
+    return counts
+
+
+# entry_id (country_year_registro_sanitario_index) as a VIRTUAL generated column:
+# SQLite computes it when the column is read, so the string is never stored.
+ENTRY_ID_SQL = (
+    "GENERATED ALWAYS AS (country || '_' || year || '_' || "
+    "coalesce(registro_sanitario, '') || '_' || dup_idx) VIRTUAL"
+)
+
+
+# ---------------------------------------------------------------------
+# Parsed-rows cache: skip re-parsing PDFs that haven't changed
+# ---------------------------------------------------------------------
+
+# This script and the PyMuPDF/MuPDF versions are part of the cache key, so
+# editing a parser or upgrading PyMuPDF (whose text extraction the parsers
+# depend on) invalidates every cached file instead of silently serving stale rows.
+_CODE_DIGEST = hashlib.sha256(
+    Path(__file__).read_bytes()
+    + f"\0{pymupdf.VersionBind}\0{pymupdf.VersionFitz}".encode()
+).digest()
+
+
+def _arrow_schema(columns):
+    """Arrow schema for columns: compact types where known, string otherwise."""
+    # country and source_file hold one value per PDF, so they are stored as
+    # dictionaries (pandas categories) rather than a string per row.
+    types = {
+        "country": pa.dictionary(pa.int8(), pa.string()),
+        "year": pa.int16(),
+        "source_file": pa.dictionary(pa.int8(), pa.string()),
+        "dup_idx": pa.int16(),
     }
+    return pa.schema([pa.field(c, types.get(c, pa.string())) for c in columns])
 
-    for fname, year in files_and_years.items():
-        path = RAW_DIR / fname
-        if not path.exists():
-            print(f"[WARN] {path} does not exist, skipping.")
-            continue
 
-        print(f"Parsing {fname} (year={year})...")
-        pdf_bytes = _load_pdf_bytes(path)
+def _cache_path(path: Path) -> Path:
+    """Cache file for one PDF: sha256 of _CODE_DIGEST, the file name and the PDF bytes."""
+    h = hashlib.sha256(_CODE_DIGEST)
+    h.update(path.name.encode())
+    # Stream the PDF through the hash rather than holding a full copy of it.
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return CACHE_DIR / f"{h.hexdigest()}.parquet"
+
 
-        if year == 2017:
-            rows = parse_2017(pdf_bytes, fname)
-        elif year in (2018, 2019):
-            rows = parse_2018_2019(pdf_bytes, year, fname)
-        elif year in (2020, 2021, 2022, 2023):
-            rows = parse_singlecol_weird(pdf_bytes, year, fname)
-        else:  # 2024, 2025+
-            rows = parse_2024plus(pdf_bytes, year, fname)
+def _read_cache(cache_path: Path):
+    return pq.read_table(cache_path).to_pydict()
 
-        print(f"  -> {len(rows)} rows")
-        all_rows.extend(rows)
 
-    df = pd.DataFrame(all_rows)
+def _write_cache(cache_path: Path, columns) -> None:
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    # Written under a temporary name and renamed: an interrupted write must not
+    # leave a truncated <sha>.parquet that later runs take for a cache hit.
+    tmp_path = cache_path.with_name(f"{cache_path.stem}.{os.getpid()}.tmp")
+    try:
+        pq.write_table(pa.table(columns, schema=_arrow_schema(COLS)), tmp_path)
+        os.replace(tmp_path, cache_path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def _merge_chunks(chunks):
+    """Concatenate the page-chunk results of one PDF into {column: list}."""
+    chunks = list(chunks)
+    return {c: list(itertools.chain.from_iterable(r[c] for r in chunks)) for c in COLS}
+
 
-    # Internal unique row id: built around Registro Sanitario as the conceptual key,
+def _file_frame(columns):
+    """
+    One PDF's rows as a DataFrame (from its column lists), with dup_idx
+    added and empty strings normalized to NA.
+    """
+    # Columns come in as lists, so the frame is built column by column
+    # instead of transposing a list of per-row dicts.
+    df = pd.DataFrame(columns, copy=False)
+    if df.empty:
+        # A PDF without rows: pandas would make the empty columns float64,
+        # which neither the Arrow schema nor the string columns accept.
+        df = df.astype(object)
+
+    # Internal row id: built around Registro Sanitario as the conceptual key,
     # but we do NOT deduplicate – every PDF row gets its own entry.
-    df["entry_id"] = (
-        df["country"].astype(str)
-        + "_"
-        + df["year"].astype(str)
-        + "_"
-        + df["registro_sanitario"].fillna("").astype(str)
-        + "_"
-        + df.groupby(["country", "year", "registro_sanitario"]).cumcount().astype(str)
+    # Only the position within (country, year, registro_sanitario) is stored;
+    # the entry_id string is derived from it on demand (see ENTRY_ID_SQL).
+    # (Each PDF is a single year, so the groups never span two files.)
+    keys = (
+        df["country"].to_numpy(),
+        df["year"].to_numpy(),
+        df["registro_sanitario"].fillna("").to_numpy(),
     )
+    df["dup_idx"] = _cumcount(*keys).astype(np.int16)
+    df["country"] = df["country"].astype("category")
+    df["year"] = df["year"].astype(np.int16)
+    df["source_file"] = df["source_file"].astype("category")
+
+    # Basic clean-up: normalize empty strings to NA (one whole-frame replace)
+    cols = [
+        c
+        for c in [
+            "consecutivo",
+            "registro_sanitario",
+            "holder",
+            "denominacion_distintiva",
+            "denominacion_generica",
+            "categoria",
+            "clase",
+            "fecha_emision",
+        ]
+        if c in df.columns
+    ]
+    df[cols] = df[cols].replace("", pd.NA)
+    return df
 
-    # Basic clean-up: normalize empty strings to NA
-    for col in [
-        "consecutivo",
-        "registro_sanitario",
-        "holder",
-        "denominacion_distintiva",
-        "denominacion_generica",
-        "categoria",
-        "clase",
-        "fecha_emision",
-    ]:
-        if col in df.columns:
-            df[col] = df[col].replace("", pd.NA)
-
-    print(f"Total rows: {len(df)}")
-
-    # Save Parquet (optional dependency: pyarrow or fastparquet)
-    try:
-        df.to_parquet(PARQUET_PATH, index=False)
-        print(f"Saved Parquet to {PARQUET_PATH}")
-    except ImportError:
+
+def build_mexico_devices():
+    # plan: one (fname, cache_path, cached, n_chunks) entry per PDF, in file order
+    plan = []
+    tasks = []
+    for fname, year in FILES_AND_YEARS.items():
+        path = RAW_DIR / fname
+        if not path.exists():
+            print(f"[WARN] {path} does not exist, skipping.")
+            continue
+
+        # Without pyarrow there is nothing to cache to; always parse.
+        cache_path = _cache_path(path) if pq is not None else None
+        if cache_path is not None and cache_path.exists():
+            print(f"Using cached rows for {fname} (year={year})")
+            plan.append((fname, cache_path, True, 0))
+            continue
+
+        with pymupdf.open(path) as doc:
+            n_pages = doc.page_count
+        print(f"Parsing {fname} (year={year}, {n_pages} pages)...")
+
+        n_chunks = 0
+        for start in range(0, n_pages, PAGES_PER_TASK):
+            tasks.append((fname, year, range(start, min(start + PAGES_PER_TASK, n_pages))))
+            n_chunks += 1
+        plan.append((fname, cache_path, False, n_chunks))
+
+    # Both sinks are written file by file as parsing finishes, so only one
+    # PDF's rows are held in memory at a time. They go to temporary files that
+    # replace the outputs only once every PDF is in, so a failed run leaves
+    # the previous Parquet/SQLite files as they were instead of partial ones.
+    tmp_parquet = PARQUET_PATH.with_name(PARQUET_PATH.name + ".tmp")
+    tmp_sqlite = SQLITE_PATH.with_name(SQLITE_PATH.name + ".tmp")
+    tmp_sqlite.unlink(missing_ok=True)
+
+    writer = None
+    if pq is not None:
+        schema = _arrow_schema(COLS + ("dup_idx",))
+        writer = pq.ParquetWriter(tmp_parquet, schema, compression="zstd")
+    else:
         print(
-            "WARNING: Could not write Parquet (missing pyarrow/fastparquet). "
+            "WARNING: Could not write Parquet (missing pyarrow). "
             "SQLite file will still be created."
         )
 
-    # Save SQLite
-    conn = sqlite3.connect(SQLITE_PATH)
-    df.to_sql("mexico_devices", conn, if_exists="replace", index=False)
+    conn = sqlite3.connect(tmp_sqlite)
 
-    # Indexes for faster lookups; registro_sanitario is the main identifier in analysis
-    conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_mexico_registro "
-        "ON mexico_devices (registro_sanitario)"
-    )
-    conn.execute(
-        "CREATE INDEX IF NOT EXISTS idx_mexico_country_year "
-        "ON mexico_devices (country, year)"
-    )
-    conn.commit()
-    conn.close()
+    # The file is rebuilt from the PDFs on every run, so durability during the
+    # bulk load doesn't matter: skip fsyncs and keep journal/temp data in memory.
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("PRAGMA journal_mode=MEMORY")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    conn.execute("PRAGMA cache_size=-200000")
+
+    total = 0
+    ok = False
+    try:
+        # Parsing is CPU-bound and every chunk is independent, so fan out over
+        # all cores; imap yields results in task order (file, then page).
+        # With every PDF cached there is nothing to parse and no pool to start.
+        with contextlib.ExitStack() as stack:
+            results = iter(())
+            if tasks:
+                pool = stack.enter_context(multiprocessing.Pool(processes=os.cpu_count() or 1))
+                results = pool.imap(_parse_pages, tasks)
+            for fname, cache_path, cached, n_chunks in plan:
+                if cached:
+                    columns = _read_cache(cache_path)
+                else:
+                    columns = _merge_chunks(itertools.islice(results, n_chunks))
+                    if cache_path is not None:
+                        _write_cache(cache_path, columns)
+
+                df = _file_frame(columns)
+                print(f"  {fname} -> {len(df)} rows")
+                total += len(df)
+
+                if writer is not None:
+                    writer.write_batch(
+                        pa.RecordBatch.from_pandas(df, schema=writer.schema, preserve_index=False)
+                    )
+                df.to_sql("mexico_devices", conn, if_exists="append", index=False)
+
+        conn.execute(f"ALTER TABLE mexico_devices ADD COLUMN entry_id TEXT {ENTRY_ID_SQL}")
+
+        # Indexes for faster lookups; registro_sanitario is the main identifier in analysis
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mexico_registro "
+            "ON mexico_devices (registro_sanitario)"
+        )
+        conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_mexico_country_year "
+            "ON mexico_devices (country, year)"
+        )
+        conn.commit()
+        ok = True
+    finally:
+        if writer is not None:
+            writer.close()
+        conn.close()
+        if not ok:
+            tmp_parquet.unlink(missing_ok=True)
+            tmp_sqlite.unlink(missing_ok=True)
+
+    print(f"Total rows: {total}")
+    if writer is not None:
+        os.replace(tmp_parquet, PARQUET_PATH)
+        print(f"Saved Parquet to {PARQUET_PATH}")
+    os.replace(tmp_sqlite, SQLITE_PATH)
     print(f"Saved SQLite DB to {SQLITE_PATH} (table: mexico_devices)")
 
 
@@ -13,13 +13,24 @@ from __future__ import annotations
 
 import argparse
 import datetime as dt
+import itertools
 import pathlib
+import re
 import sqlite3
+from concurrent.futures import ThreadPoolExecutor
 from typing import Dict, List
 
+import numpy as np
 import pandas as pd
 import requests
 
+from quick_qa import run_qa
+
+try:  # fast XLSX reader for pandas; without it we stream the sheet with openpyxl
+    import python_calamine
+except ImportError:
+    python_calamine = None
+
 PMDA_EXCEL_URL = "https://www.pmda.go.jp/files/000277537.xlsx"
 # URL taken from the official PMDA page; Excel link is published
 # alongside the PDF認証品目リスト.:contentReference[oaicite:1]{index=1}
@@ -31,37 +42,164 @@ def download_excel(url: str, out_path: pathlib.Path, force: bool = False) -> Non
         print(f"[download] {out_path} already exists – skipping download")
         return
 
+    # Conditional GET: with a local copy, the server only sends the file if it
+    # changed. Only validators the server sent for that copy are used (kept in
+    # sidecar files), never the local mtime, so a copy from anywhere else is
+    # always fetched again.
+    etag_path = out_path.with_suffix(".etag")
+    last_modified_path = out_path.with_suffix(".last-modified")
+    headers = {}
+    if out_path.exists():
+        if etag_path.exists():
+            headers["If-None-Match"] = etag_path.read_text().strip()
+        if last_modified_path.exists():
+            headers["If-Modified-Since"] = last_modified_path.read_text().strip()
+
+    # Streamed to a .part file that replaces out_path only once complete, so
+    # a broken download never leaves a truncated workbook (with validators
+    # that would make the next run keep it).
+    part_path = out_path.with_suffix(".part")
     print(f"[download] Fetching {url}")
-    resp = requests.get(url, stream=True, timeout=120)
-    resp.raise_for_status()
-    with out_path.open("wb") as f:
-        for chunk in resp.iter_content(chunk_size=8192):
-            if chunk:
-                f.write(chunk)
+    try:
+        with requests.get(url, stream=True, timeout=120, headers=headers) as resp:
+            if resp.status_code == 304:
+                print(f"[download] {out_path} not modified upstream – keeping it")
+                return
+            resp.raise_for_status()
+            with part_path.open("wb") as f:
+                for chunk in resp.iter_content(chunk_size=1024 * 1024):
+                    if chunk:
+                        f.write(chunk)
+            etag = resp.headers.get("ETag")
+            last_modified = resp.headers.get("Last-Modified")
+        part_path.replace(out_path)
+    finally:
+        part_path.unlink(missing_ok=True)
+
+    for path, value in ((etag_path, etag), (last_modified_path, last_modified)):
+        if value:
+            path.write_text(value)
+        else:
+            path.unlink(missing_ok=True)
     print(f"[download] Saved to {out_path}")
 
 
+def _header_labels(values) -> List[str]:
+    """
+    Column labels from a header row the way pd.read_excel makes them:
+    blanks become 'Unnamed: i', repeated labels get '.1', '.2', ... suffixes
+    (normalize_column_names relies on that for the two 法人番号 columns).
+    """
+    labels = []
+    seen: Dict[str, int] = {}
+    for i, v in enumerate(values):
+        name = f"Unnamed: {i}" if v is None or pd.isna(v) else str(v)
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}.{seen[name]}"
+        else:
+            seen[name] = 0
+        labels.append(name)
+    return labels
+
+
+def _read_sheet_openpyxl(excel_path: pathlib.Path, max_header_row: int = 10) -> pd.DataFrame:
+    """
+    Fallback for read_pmda_excel when calamine is not installed.
+
+    Streams the first sheet in openpyxl's read-only mode instead of letting
+    pd.read_excel load the full (styled) workbook, and returns the same
+    all-string frame as _read_sheet_calamine, empty cells as NaN.
+    """
+    import openpyxl
+
+    wb = openpyxl.load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        for header_row, header in enumerate(itertools.islice(rows, max_header_row)):
+            if any("認証番号" in str(v) for v in header if v is not None):
+                break
+        else:
+            raise ValueError("Could not locate PMDA header row containing '認証番号'.")
+        print(f"[read] Using header row {header_row}")
+
+        # Cell values as pandas' dtype=str would give them (12.0 -> '12').
+        records = [
+            [
+                None if v is None or v == ""
+                else str(int(v)) if isinstance(v, float) and v.is_integer()
+                else str(v)
+                for v in row
+            ]
+            for row in rows
+        ]
+    finally:
+        wb.close()
+
+    return pd.DataFrame.from_records(records, columns=_header_labels(header))
+
+
+def _read_sheet_calamine(excel_path: pathlib.Path, max_header_row: int = 10) -> pd.DataFrame:
+    # The first row may be a title row. calamine loads the whole sheet even
+    # for a small nrows= probe, so parse it once without a header, find the
+    # header among the leading rows and promote it.
+    raw = pd.read_excel(excel_path, sheet_name=0, header=None, dtype=str, engine="calamine")
+    is_header = raw.head(max_header_row).apply(
+        lambda r: r.astype(str).str.contains("認証番号").any(), axis=1
+    )
+    if not is_header.any():
+        raise ValueError("Could not locate PMDA header row containing '認証番号'.")
+    header_row = int(is_header.idxmax())
+    print(f"[read] Using header row {header_row}")
+
+    df = raw.iloc[header_row + 1:].reset_index(drop=True)
+    df.columns = _header_labels(raw.iloc[header_row])
+    return df
+
+
 def read_pmda_excel(excel_path: pathlib.Path) -> pd.DataFrame:
-    # Try a couple of headers just in case the first row is a title row.
-    for header_row in (0, 1, 2):
-        df = pd.read_excel(
-            excel_path,
-            sheet_name=0,
-            header=header_row,
-            dtype=str
-        )
-        if any(df.columns.astype(str).str.contains("認証番号")):
-            print(f"[read] Using header row {header_row}")
-            break
-    # Drop rows that are completely empty
+    # calamine is much faster than openpyxl; the openpyxl path is the fallback.
+    if python_calamine is not None:
+        df = _read_sheet_calamine(excel_path)
+    else:
+        df = _read_sheet_openpyxl(excel_path)
     df = df.dropna(how="all")
-
-    # Ensure column labels are strings
     df.columns = [str(c).strip() for c in df.columns]
-
+    # Arrow-backed strings: one contiguous buffer per column instead of a
+    # Python object per cell, and .str / groupby / duplicated run on Arrow
+    # kernels. Missing cells become pd.NA.
+    df = df.astype("string[pyarrow]")
     return df
 
 
+# (pattern, column) in the order the headers are tested; the first hit wins.
+# The two 法人番号 headers are told apart by position, see normalize_column_names.
+COLUMN_PATTERNS = [
+    ("Ｎｏ|(?i:^no)", "row_number"),
+    ("認証機関コード", "certification_body_code"),
+    ("認証番号", "certification_number"),
+    ("認証年月日", "certification_date"),
+    ("販売名", "brand_name"),
+    ("一般的名称", "generic_name"),
+    ("業者名_認証取得者", "certificate_holder_name"),
+    ("業者名_選任外国製造医療機器等製造販売業者", "designated_foreign_holder_name"),
+    ("法人番号", "corporate_number"),
+    ("承認からの移行認証", "transition_from_approval_flag"),
+    ("承継品目", "succession_flag"),
+    ("承継年月日", "succession_date"),
+    ("承継時認証機関変更", "cert_body_changed_on_succession_flag"),
+    ("認証整理日", "certification_discontinuation_date"),
+    ("認証取消日", "certification_cancellation_date"),
+]
+
+# One lookahead per pattern, tried left to right from the start of the header,
+# so a single match() keeps the priority order of the list above.
+_COLUMN_RX = re.compile("|".join(
+    f"(?=.*?(?P<g{i}>{p}))" for i, (p, _) in enumerate(COLUMN_PATTERNS)
+), re.DOTALL)
+_COLUMN_FOR_GROUP = {f"g{i}": name for i, (_, name) in enumerate(COLUMN_PATTERNS)}
+
+
 def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     """
     Map Japanese PMDA column names to English lower_snake_case.
@@ -72,73 +210,135 @@ def normalize_column_names(df: pd.DataFrame) -> pd.DataFrame:
     corp_no_seen = 0
 
     for orig in df.columns:
-        col = str(orig)
-
-        if "Ｎｏ" in col or col.lower().startswith("no"):
-            new_cols[orig] = "row_number"
-        elif "認証機関コード" in col:
-            new_cols[orig] = "certification_body_code"
-        elif "認証番号" in col:
-            new_cols[orig] = "certification_number"
-        elif "認証年月日" in col:
-            new_cols[orig] = "certification_date"
-        elif "販売名" in col:
-            new_cols[orig] = "brand_name"
-        elif "一般的名称" in col:
-            new_cols[orig] = "generic_name"
-        elif "業者名_認証取得者" in col:
-            new_cols[orig] = "certificate_holder_name"
-        elif "業者名_選任外国製造医療機器等製造販売業者" in col:
-            new_cols[orig] = "designated_foreign_holder_name"
-        elif "法人番号" in col:
-            corp_no_seen += 1
-            if corp_no_seen == 1:
-                new_cols[orig] = "certificate_holder_corporate_number"
-            else:
-                new_cols[orig] = "designated_foreign_holder_corporate_number"
-        elif "承認からの移行認証" in col:
-            new_cols[orig] = "transition_from_approval_flag"
-        elif "承継品目" in col:
-            new_cols[orig] = "succession_flag"
-        elif "承継年月日" in col:
-            new_cols[orig] = "succession_date"
-        elif "承継時認証機関変更" in col:
-            new_cols[orig] = "cert_body_changed_on_succession_flag"
-        elif "認証整理日" in col:
-            new_cols[orig] = "certification_discontinuation_date"
-        elif "認証取消日" in col:
-            new_cols[orig] = "certification_cancellation_date"
-        else:
+        m = _COLUMN_RX.match(str(orig))
+        if m is None:
             # Generic but still English / snake_case
             new_cols[orig] = f"extra_col_{extra_idx}"
             extra_idx += 1
+            continue
+
+        name = _COLUMN_FOR_GROUP[m.lastgroup]
+        if name == "corporate_number":
+            # First 法人番号 belongs to the certificate holder, the second to
+            # the designated foreign holder
+            corp_no_seen += 1
+            if corp_no_seen == 1:
+                name = "certificate_holder_corporate_number"
+            else:
+                name = "designated_foreign_holder_corporate_number"
+        new_cols[orig] = name
 
     df = df.rename(columns=new_cols)
     return df
 
 
+def _map_columns(df: pd.DataFrame, colnames: List[str], func) -> pd.DataFrame:
+    """
+    Replace each of colnames present in df with func(df[c]).
+
+    The columns are independent and the work is mostly in pandas/NumPy
+    kernels, so they are converted on a small thread pool; df itself is
+    only assigned to afterwards, from this thread.
+    """
+    cols = [c for c in colnames if c in df.columns]
+    if not cols:
+        return df
+    with ThreadPoolExecutor(max_workers=min(8, len(cols))) as ex:
+        results = list(ex.map(lambda c: func(df[c]), cols))
+    for c, s in zip(cols, results):
+        df[c] = s
+    return df
+
+
+def _normalize_flag_column(values: pd.Series) -> pd.Series:
+    # Common "true" symbols in Japanese tables are ○, 〇, '1', 'Y', but any
+    # non-empty value counts as true; absence is null.
+    s = values.astype("string").str.strip().fillna("")
+    return pd.Series(np.where(s.eq("").to_numpy(dtype=bool), None, "1"), index=values.index)
+
+
 def normalize_flags(df: pd.DataFrame, colnames: List[str]) -> pd.DataFrame:
     """
     Convert columns like '○' / '' into '1' / '0'.
     Any non-empty non-○ value is treated as '1' conservatively.
     """
+    return _map_columns(df, colnames, _normalize_flag_column)
 
-    def parse_flag(val):
-        if pd.isna(val):
-            return None
-        s = str(val).strip()
-        if not s:
-            return None
-        # Common "true" symbols in Japanese tables: ○, 〇, '1', 'Y'
-        if s in {"○", "〇", "1", "Y", "YES", "Yes"}:
-            return "1"
-        return "1"  # treat any non-empty as true; absence is null
-
-    for c in colnames:
-        if c in df.columns:
-            df[c] = df[c].map(parse_flag)
 
-    return df
+# Date formats seen in PMDA exports, tried on a sample of each date column
+_DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d")
+# Serial number of 9999-12-31, the last date Excel can represent
+_EXCEL_MAX_SERIAL = 2958466
+
+
+def _dominant_date_format(values: pd.Series, sample_size: int = 200):
+    """The format in _DATE_FORMATS matching most of a sample, or None if none match."""
+    sample = values.dropna().head(sample_size)
+    best, best_hits = None, 0
+    for fmt in _DATE_FORMATS:
+        hits = pd.to_datetime(sample, format=fmt, errors="coerce").notna().sum()
+        if hits > best_hits:
+            best, best_hits = fmt, hits
+    return best
+
+
+_DUPARSER = None
+
+
+def _get_duparser():
+    """dateutil's parser, imported on first use (only Fallback B needs it)."""
+    global _DUPARSER
+    if _DUPARSER is None:
+        from dateutil import parser as duparser
+        _DUPARSER = duparser
+    return _DUPARSER
+
+
+def _parse_date_fallback(x):
+    """Parse one free-form date string with dateutil; NaT if blank or unparseable."""
+    if pd.isna(x) or str(x).strip() == "":
+        return pd.NaT
+    try:
+        return pd.Timestamp(_get_duparser().parse(str(x), dayfirst=False, yearfirst=False))
+    except Exception:
+        return pd.NaT
+
+
+def _normalize_date_column(values: pd.Series) -> pd.Series:
+    """One date column as YYYY-MM-DD strings, NaN where no date was found."""
+    # First pass: pandas native parsing with the column's format, so it
+    # isn't inferred (cache: each distinct string is converted once, and
+    # PMDA dates repeat a lot). Rows in other formats go to the fallbacks.
+    fmt = _dominant_date_format(values)
+    ser = pd.to_datetime(values, format=fmt, errors="coerce", cache=True)
+
+    # Fallback A: Excel serial numbers (days since 1899-12-30)
+    # (one numpy pass; values outside Excel's date range are left to B)
+    need = ser.isna().to_numpy()
+    if need.any():
+        nums = pd.to_numeric(values, errors="coerce").to_numpy(dtype="float64", na_value=np.nan)
+        ok = need & np.isfinite(nums) & (np.abs(nums) < _EXCEL_MAX_SERIAL)
+        if ok.any():
+            days = np.floor(np.where(ok, nums, 0)).astype("int64")
+            serial = np.datetime64("1899-12-30", "s") + days.astype("timedelta64[D]")
+            # Merge at second resolution: pandas 2.x parses to datetime64[ns],
+            # and np.where would cast serials past 2262-04-11 to ns unchecked
+            # (they wrap to wrong dates); [s] holds Excel's whole range.
+            ser = pd.Series(
+                np.where(ok, serial, ser.to_numpy().astype("datetime64[s]")), index=ser.index
+            )
+
+    # Fallback B: dateutil for things like "01-Aug-2025", locale-independent
+    need = ser.isna()
+    if need.any():
+        # dateutil is slow per call, so parse each distinct value only once
+        vals = values[need].dropna()
+        if len(vals):
+            parsed = {v: _parse_date_fallback(v) for v in vals.unique()}
+            ser.loc[vals.index] = pd.to_datetime(vals.map(parsed))
+
+    # Final: format to ISO or leave as NaT -> becomes NULL later
+    return ser.dt.strftime("%Y-%m-%d")
 
 
 def normalize_dates(df: pd.DataFrame, colnames: list[str]) -> pd.DataFrame:
@@ -149,51 +349,22 @@ def normalize_dates(df: pd.DataFrame, colnames: list[str]) -> pd.DataFrame:
       - Excel serial numbers (e.g., 45500)
       - blanks and None -> NULL
     """
-    from dateutil import parser as duparser
-
-    out = df.copy()
-
-    for c in colnames:
-        if c not in out.columns:
-            continue
-
-        # First pass: try pandas native parsing
-        ser = pd.to_datetime(out[c], errors="coerce")
+    return _map_columns(df, colnames, _normalize_date_column)
 
-        # Fallback A: Excel serial numbers (days since 1899-12-30)
-        need = ser.isna()
-        if need.any():
-            nums = pd.to_numeric(out.loc[need, c], errors="coerce")
-            mask = nums.notna()
-            if mask.any():
-                base = pd.Timestamp("1899-12-30")
-                ser.loc[need[need].index[mask]] = base + pd.to_timedelta(nums[mask], unit="D")
 
-        # Fallback B: dateutil for things like "01-Aug-2025", locale-independent
-        need = ser.isna()
-        if need.any():
-            def _parse(x):
-                if pd.isna(x) or str(x).strip() == "":
-                    return pd.NaT
-                try:
-                    return pd.Timestamp(duparser.parse(str(x), dayfirst=False, yearfirst=False))
-                except Exception:
-                    return pd.NaT
-            ser.loc[need] = out.loc[need, c].apply(_parse)
+def utc_timestamp() -> str:
+    """Current UTC time as ISO 8601 with a Z suffix, e.g. 2025-08-29T01:02:03Z."""
+    now = dt.datetime.now(dt.timezone.utc).replace(microsecond=0)
+    return now.isoformat().replace("+00:00", "Z")
 
-        # Final: format to ISO or leave as NaT -> becomes NULL later
-        out[c] = ser.dt.strftime("%Y-%m-%d")
 
-    return out
-
-
-
-def add_provenance(df: pd.DataFrame, source_url: str, source_file: str) -> pd.DataFrame:
-    df = df.copy()
+def add_provenance(
+    df: pd.DataFrame, source_url: str, source_file: str, ingested_at: str
+) -> pd.DataFrame:
     df["country_code"] = "JP"
     df["source_url"] = source_url
     df["source_file"] = source_file
-    df["ingested_at"] = dt.datetime.utcnow().replace(microsecond=0).isoformat() + "Z"
+    df["ingested_at"] = ingested_at
     return df
 
 
@@ -208,7 +379,6 @@ def deduplicate_with_flags(df: pd.DataFrame) -> pd.DataFrame:
       duplicate_flag = 1.
     """
 
-    df = df.copy()
     df["duplicate_flag"] = 0
 
     key_cols = [
@@ -225,7 +395,6 @@ def deduplicate_with_flags(df: pd.DataFrame) -> pd.DataFrame:
         df = df.drop_duplicates(subset=core_cols, keep="first")
         return df
 
-    groups = []
     compare_exclude = {
         "row_number",
         "ingested_at",
@@ -233,43 +402,63 @@ def deduplicate_with_flags(df: pd.DataFrame) -> pd.DataFrame:
         "source_file",
         "duplicate_flag",
     }
-
-    for _, g in df.groupby(key_cols, dropna=False):
-        if len(g) == 1:
-            groups.append(g)
-            continue
-
-        compare_cols = [c for c in df.columns if c not in compare_exclude]
-
-        # Check if all rows are identical over compare_cols
-        same_all = True
-        for c in compare_cols:
-            if g[c].nunique(dropna=False) > 1:
-                same_all = False
-                break
-
-        if same_all:
-            # Clear duplicate: keep first row only
-            g = g.iloc[[0]].copy()
-        else:
-            # Ambiguous: keep all and flag
-            g = g.copy()
-            g["duplicate_flag"] = 1
-
-        groups.append(g)
-
-    return pd.concat(groups, ignore_index=True)
+    compare_cols = [c for c in df.columns if c not in compare_exclude]
+
+    # Group ids in sorted key order (the order groups were emitted in when this
+    # was a loop over df.groupby).
+    keys = df.groupby(key_cols, dropna=False).ngroup()
+
+    # Only rows whose key occurs more than once can be duplicates, so the
+    # wide comparison over compare_cols runs on those alone (a few percent of
+    # PMDA rows); everything else is a single-row group and stays unflagged.
+    cand = keys.duplicated(keep=False).to_numpy()
+    ambiguous = pd.Series(False, index=df.index)
+    if cand.any():
+        # An id per distinct compared row. Ambiguous: the group's rows differ
+        # in some compared column, i.e. it holds more than one distinct row
+        # -> keep all and flag.
+        rows = df.loc[cand, compare_cols].groupby(compare_cols, dropna=False, sort=False).ngroup()
+        ambiguous[cand] = (rows.groupby(keys[cand]).transform("nunique") > 1).to_numpy()
+    df["duplicate_flag"] = ambiguous.astype(int)
+
+    # Clear duplicate (or single row): keep the group's first row only.
+    # The kept rows are taken in group order with a single copy of the frame.
+    keep = np.flatnonzero((ambiguous | ~keys.duplicated()).to_numpy())
+    keep = keep[np.argsort(keys.to_numpy()[keep], kind="stable")]
+    return df.take(keep).reset_index(drop=True)
+
+
+# Lookup indexes on devices: index name -> column(s). The key index also
+# serves lookups by certification_number alone (its leading column) and the
+# duplicate-group count in quick_qa.py.
+DEVICE_INDEXES = {
+    "idx_devices_key": "certification_number, brand_name, certificate_holder_name",
+    "idx_devices_holder": "certificate_holder_name",
+    "idx_devices_brand": "brand_name",
+}
 
 
 def write_sqlite(df: pd.DataFrame, db_path: pathlib.Path) -> None:
     db_path.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(db_path)
+    # Autocommit mode: the whole load is one explicit transaction below
+    conn = sqlite3.connect(db_path, isolation_level=None)
     try:
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-200000")
+
         cur = conn.cursor()
+        # The table is rebuilt on each run, in the same transaction as the
+        # insert, so a schema change here always takes effect. id is the plain
+        # rowid (no AUTOINCREMENT, so no sqlite_sequence upkeep): 1..n in
+        # output order on every run.
+        cur.execute("BEGIN")
+        cur.execute("DROP TABLE IF EXISTS devices")
         cur.execute(
             """
-            CREATE TABLE IF NOT EXISTS devices (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
+            CREATE TABLE devices (
+                id INTEGER PRIMARY KEY,
                 country_code TEXT,
                 certification_body_code TEXT,
                 certification_number TEXT,
@@ -295,30 +484,41 @@ def write_sqlite(df: pd.DataFrame, db_path: pathlib.Path) -> None:
             """
         )
 
-        # Replace table contents on each run
-        cur.execute("DELETE FROM devices;")
-        conn.commit()
-
-        df.to_sql("devices", conn, if_exists="append", index=False)
-        conn.commit()
-    finally:
-        conn.close()
-
-def create_indexes(db_path):
-    import sqlite3
-    conn = sqlite3.connect(db_path)
-    try:
-        cur = conn.cursor()
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_devices_certnum ON devices(certification_number)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_devices_holder ON devices(certificate_holder_name)")
-        cur.execute("CREATE INDEX IF NOT EXISTS idx_devices_brand  ON devices(brand_name)")
-        conn.commit()
+        cols = list(df.columns)
+        insert_sql = (
+            f"INSERT INTO devices ({', '.join(cols)}) "
+            f"VALUES ({', '.join('?' * len(cols))})"
+        )
+        # Column values as Python objects; only columns that have missing values
+        # need NaN/NA swapped for None so they bind as NULL.
+        values = [
+            df[c].astype(object).where(df[c].notna(), None).tolist() if df[c].hasnans
+            else df[c].tolist()
+            for c in cols
+        ]
+
+        # One prepared statement for all rows; the indexes don't exist yet, so
+        # the insert doesn't maintain them row by row.
+        cur.executemany(insert_sql, zip(*values))
+        cur.execute("COMMIT")
+
+        # Build the indexes together in one transaction, then refresh the
+        # planner statistics (sqlite_stat1) for the lookups in quick_qa.py.
+        cur.executescript(
+            "BEGIN;\n"
+            + "".join(
+                f"CREATE INDEX {name} ON devices({index_cols});\n"
+                for name, index_cols in DEVICE_INDEXES.items()
+            )
+            + "COMMIT;\nANALYZE;"
+        )
     finally:
         conn.close()
 
 
-
 def build_pipeline(db_path: pathlib.Path, excel_path: pathlib.Path, force_download: bool) -> None:
+    # One ingestion timestamp for the whole run
+    ingested_at = utc_timestamp()
     download_excel(PMDA_EXCEL_URL, excel_path, force=force_download)
     df = read_pmda_excel(excel_path)
     df = normalize_column_names(df)
@@ -344,39 +544,14 @@ def build_pipeline(db_path: pathlib.Path, excel_path: pathlib.Path, force_downlo
     )
 
     # Add provenance
-    df = add_provenance(df, PMDA_EXCEL_URL, excel_path.name)
+    df = add_provenance(df, PMDA_EXCEL_URL, excel_path.name, ingested_at)
 
     # Deduplicate
     df = deduplicate_with_flags(df)
 
-    # Replace NaN with None so SQLite gets NULLs
-    df = df.where(pd.notnull(df), None)
-
-    # Write to SQLite
+    # Write to SQLite (missing values become NULLs there)
     write_sqlite(df, db_path)
-    create_indexes(db_path)
-    import json, sqlite3, os
-    os.makedirs("reports", exist_ok=True)
-    con = sqlite3.connect(db_path)
-    row_count = con.execute("SELECT COUNT(*) FROM devices").fetchone()[0]
-    null_cert = con.execute("SELECT COUNT(*) FROM devices WHERE certification_number IS NULL OR certification_number=''").fetchone()[0]
-    dupe_groups = con.execute("""
-    SELECT COUNT(*) FROM (
-    SELECT certification_number, brand_name, certificate_holder_name, COUNT(*) c
-    FROM devices GROUP BY 1,2,3 HAVING c>1
-    ) t
-    """).fetchone()[0]
-    min_dt, max_dt = con.execute("SELECT MIN(certification_date), MAX(certification_date) FROM devices").fetchone()
-    con.close()
-    with open("reports/jp_pmda_qa.json","w",encoding="utf-8") as f:
-        json.dump({
-        "row_count": row_count,
-        "null_certification_number": null_cert,
-        "duplicate_groups": dupe_groups,
-        "min_certification_date": min_dt,
-        "max_certification_date": max_dt
-        }, f, ensure_ascii=False, indent=2)
-    print("[qa] wrote reports/jp_pmda_qa.json")  
+    run_qa(db_path)
     print(f"[done] Wrote {len(df)} rows to {db_path}")
 
 
@@ -397,24 +572,11 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--force-download",
         action="store_true",
-        help="Re-download the Excel file even if it already exists.",
+        help="Re-download the Excel file even if it already exists "
+        "(skipped if the server reports it unchanged).",
     )
     return parser.parse_args()
 
-def read_pmda_excel(excel_path: pathlib.Path) -> pd.DataFrame:
-    found = False
-    for header_row in (0, 1, 2):
-        df = pd.read_excel(excel_path, sheet_name=0, header=header_row, dtype=str)
-        if any(df.columns.astype(str).str.contains("認証番号")):
-            print(f"[read] Using header row {header_row}")
-            found = True
-            break
-    if not found:
-        raise ValueError("Could not locate PMDA header row containing '認証番号'.")
-    df = df.dropna(how="all")
-    df.columns = [str(c).strip() for c in df.columns]
-    return df
-
 
 if __name__ == "__main__":
     args = parse_args()